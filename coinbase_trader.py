@@ -6,19 +6,29 @@ The bot periodically checks the market, analyzes the price history,
 and executes buy/sell orders based on the analysis.
 """
 
+import argparse
+import atexit
 import logging
 import os
+import queue
+import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Any
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, Dict, List, Optional, Tuple, Any
 import platform
 
-import pygame
-
-# import pygame only if it is windows
-if platform.system() == 'Windows':
 import cbpro
-from dotenv import load_dotenv 
+import numpy as np
+import orjson
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+# The platform cannot change while the bot runs, so detect it once.
+IS_WINDOWS = platform.system() == 'Windows'
 
 # --- Configuration ---
 # Load environment variables from .env file.
@@ -32,149 +42,475 @@ API_PASSPHRASE = os.getenv('COINBASE_PASSPHRASE')
 # Trading parameters.
 ETH_SYMBOL = 'ETH-EUR'
 BTC_SYMBOL = 'BTC-EUR'
+SYMBOLS = (ETH_SYMBOL, BTC_SYMBOL)  # Products whose prices are tracked.
 CHECK_INTERVAL = 3600  # Check the market every hour.
 MOVING_AVG_SHORT = 12  # 12-hour short moving average.
 MOVING_AVG_LONG = 26  # 26-hour long moving average.
 MIN_EUR_TRADE = 10  # Minimum EUR amount for a trade.
 MIN_ETH_TRADE = 0.01  # Minimum ETH amount for a trade.
 TRADE_PERCENTAGE = 0.9  # Percentage of balance to trade
+SIGNALS = ('SELL', 'HOLD', 'BUY')  # Indexed by the sign of (short MA - long MA) plus one.
+BALANCES_TTL = 30  # Seconds to reuse fetched balances; our own orders invalidate them.
+HTTP_POOL_SIZE = 4  # Keep-alive connections to the REST API; at least the number of request threads.
+FEED_MAX_AGE = 60  # Seconds after which a websocket price is considered stale.
+NUM_PRICE_POINTS = 10  # Number of price points to display (10 hours).
+MAX_HISTORY = max(MOVING_AVG_SHORT, MOVING_AVG_LONG) + 5  # Keep a little more to avoid issues.
+HISTORY_FILE = 'price_history.npz'  # Price history saved across restarts.
+HISTORY_MAX_AGE = 2 * CHECK_INTERVAL  # Seconds after which a saved history is too old to resume.
 
 # --- Logging ---
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='trading_bot.log'
-)
+LOG_FILE = 'trading_bot.log'
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 logger = logging.getLogger('coinbase_trader')
 
+def start_logging() -> None:
+    """
+    Configures logging to LOG_FILE through a queue, so records are written to disk
+    by a background thread instead of the trading thread. Pending records are
+    flushed when the interpreter exits.
+    """
+    file_handler = logging.FileHandler(LOG_FILE)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+
+@dataclass(slots=True)
+class Balances:
+    """
+    Account balances for EUR, ETH, and BTC. Currencies without an account default to 0.
+    The *_avail fields hold the balance available for trading.
+    """
+    eur_bal: float = 0.0
+    eur_avail: float = 0.0
+    eth_bal: float = 0.0
+    eth_avail: float = 0.0
+    btc_bal: float = 0.0
+    btc_avail: float = 0.0
+
+# --- Console Constants ---
+CONSOLE_BORDER = "-----------------------------------------"
+
 # --- Pygame Constants ---
-if platform.system() == 'Windows':
-    # Window settings.
-    WINDOW_WIDTH = 800
-    WINDOW_HEIGHT = 600
-
-    # Colors.
-    BLACK = (0, 0, 0)
-    WHITE = (255, 255, 255)
-    GREEN = (0, 255, 0)
-    RED = (255, 0, 0)
-    BLUE = (0, 0, 255)
-    YELLOW = (255, 255, 0)
-
-    # Graph constants.
-    GRAPH_WIDTH = 600
-    GRAPH_HEIGHT = 200
-    GRAPH_X = 100
-    GRAPH_Y = 350
-    NUM_PRICE_POINTS = 10  # Number of price points to display (10 hours).
-
-    class PygameWindow:
-        """
-        A class to manage the Pygame graphical window for the trading bot.
-        """
-        def __init__(self) -> None:
-            """
-            Initializes the Pygame window.
-            """
-            pygame.init()
-            self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-            pygame.display.set_caption("Coinbase Trader Bot")
-            self.font = pygame.font.Font(None, 30)
-
-        def draw_text(self, text: str, color: Tuple[int, int, int], x: int, y: int) -> None:
-            """
-            Draws text on the screen.
-
-            Args:
-                text (str): The text to draw.
-                color (Tuple[int, int, int]): The color of the text.
-                x (int): The x-coordinate.
-                y (int): The y-coordinate.
-            """
-            text_surface = self.font.render(text, True, color)
-            text_rect = text_surface.get_rect()
-            text_rect.topleft = (x, y)
-            self.screen.blit(text_surface, text_rect)
-
-        def draw_graph(self, prices: List[float], max_price: float, min_price: float) -> None:
-            """
-            Draws a simple graph of ETH-EUR price history using rectangles.
-
-            Args:
-                prices (List[float]): The list of ETH-EUR prices.
-                max_price (float): The maximum price in the history.
-                min_price (float): The minimum price in the history.
-            """
-            if not prices:
-                return
-
-            price_range = max_price - min_price
-            bar_width = GRAPH_WIDTH / len(prices)
-
-            for i, price in enumerate(prices):
-                if price_range == 0:
-                    bar_height = GRAPH_HEIGHT // 2  # Avoid division by zero
-                else:
-                    bar_height = int((price - min_price) / price_range * GRAPH_HEIGHT)
-
-                bar_x = GRAPH_X + i * bar_width
-                bar_y = GRAPH_Y + GRAPH_HEIGHT - bar_height
-
-                pygame.draw.rect(self.screen, BLUE, (bar_x, bar_y, bar_width, bar_height))
-
-        def update_display(self, current_prices: Dict[str, float], balances: Dict[str, Dict[str, float]], analysis: Dict[str, Any], total_profit_loss: float, eth_prices:List[float], max_price: float, min_price: float) -> None:
-            """
-            Updates the display with current market data, balances, signal, profit/loss, and graph.
-            """
-            self.screen.fill(BLACK)
-            self.draw_text(f"ETH-EUR Price: {current_prices['ETH-EUR']:.2f}", WHITE, 50, 50)
-            self.draw_text(f"EUR Balance: {balances.get('EUR', {}).get('balance', 0):.2f}", GREEN, 50, 100)
-            self.draw_text(f"ETH Balance: {balances.get('ETH', {}).get('balance', 0):.4f}", GREEN, 50, 150)
-            self.draw_text(f"Signal: {analysis['signal']}", RED if analysis['signal'] == 'SELL' else GREEN if analysis['signal'] == 'BUY' else YELLOW, 50, 200)
-            self.draw_text(f"Total Profit/Loss: {total_profit_loss:.2f}", WHITE, 50, 250)
-            self.draw_graph(eth_prices, max_price, min_price)
-            pygame.display.flip()
+# Window settings.
+WINDOW_WIDTH = 800
+WINDOW_HEIGHT = 600
+
+# Colors.
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+YELLOW = (255, 255, 0)
+SIGNAL_COLOR = {'BUY': GREEN, 'SELL': RED, 'HOLD': YELLOW}  # Text color for each trading signal.
+
+# Graph constants.
+GRAPH_WIDTH = 600
+GRAPH_HEIGHT = 200
+GRAPH_X = 100
+GRAPH_Y = 350
+
+class PygameWindow:
+    """
+    A class to manage the Pygame graphical window for the trading bot.
+    """
+    def __init__(self) -> None:
+        """
+        Initializes the Pygame window.
+        """
+        # Imported here rather than at module level, so console-only hosts do not need SDL or pay for importing it.
+        import pygame
+        self.pygame = pygame
+        pygame.init()
+        self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        pygame.display.set_caption("Coinbase Trader Bot")
+        self.font = pygame.font.Font(None, 30)
+        self._label_surfaces: Dict[Tuple[str, Tuple[int, int, int]], pygame.Surface] = {}  # Rendered static labels.
+
+    def draw_text(self, text: str, color: Tuple[int, int, int], x: int, y: int) -> None:
+        """
+        Draws text on the screen.
+
+        Args:
+            text (str): The text to draw.
+            color (Tuple[int, int, int]): The color of the text.
+            x (int): The x-coordinate.
+            y (int): The y-coordinate.
+        """
+        text_surface = self.font.render(text, True, color)
+        text_rect = text_surface.get_rect()
+        text_rect.topleft = (x, y)
+        self.screen.blit(text_surface, text_rect)
+
+    def draw_label(self, label: str, value: str, color: Tuple[int, int, int], x: int, y: int) -> None:
+        """
+        Draws a constant label followed by a changing value.
+        The label is rendered once and reused, so only the value is rendered each frame.
+
+        Args:
+            label (str): The constant label text, e.g. "EUR Balance: ".
+            value (str): The formatted value to draw after the label.
+            color (Tuple[int, int, int]): The color of the text.
+            x (int): The x-coordinate.
+            y (int): The y-coordinate.
+        """
+        label_surface = self._label_surfaces.get((label, color))
+        if label_surface is None:
+            label_surface = self._label_surfaces[(label, color)] = self.font.render(label, True, color)
+        self.screen.blit(label_surface, (x, y))
+        self.draw_text(value, color, x + label_surface.get_width(), y)
+
+    def draw_graph(self, prices: np.ndarray, max_price: float, min_price: float) -> None:
+        """
+        Draws a simple graph of ETH-EUR price history using rectangles.
+
+        Args:
+            prices (np.ndarray): The ETH-EUR prices, oldest first.
+            max_price (float): The maximum price in the history.
+            min_price (float): The minimum price in the history.
+        """
+        if len(prices) == 0:
+            return
+
+        price_range = max_price - min_price
+        bar_width = GRAPH_WIDTH / len(prices)
+
+        # Compute the geometry of all bars at once.
+        if price_range == 0:
+            bar_heights = np.full(len(prices), GRAPH_HEIGHT // 2)  # Avoid division by zero
+        else:
+            bar_heights = ((prices - min_price) / price_range * GRAPH_HEIGHT).astype(np.int32)
+        bar_xs = GRAPH_X + np.arange(len(prices)) * bar_width
+
+        # Filling an axis-aligned rectangle is cheaper than pygame.draw.rect.
+        for bar_x, bar_height in zip(bar_xs.tolist(), bar_heights.tolist()):
+            self.screen.fill(BLUE, (bar_x, GRAPH_Y + GRAPH_HEIGHT - bar_height, bar_width, bar_height))
+
+    def update_display(self, current_prices: Dict[str, float], balances: Balances, analysis: Dict[str, Any], total_profit_loss: float, eth_prices: np.ndarray, max_price: float, min_price: float) -> None:
+        """
+        Updates the display with current market data, balances, signal, profit/loss, and graph.
+        """
+        self.screen.fill(BLACK)
+        self.draw_label("ETH-EUR Price: ", f"{current_prices[ETH_SYMBOL]:.2f}", WHITE, 50, 50)
+        self.draw_label("EUR Balance: ", f"{balances.eur_bal:.2f}", GREEN, 50, 100)
+        self.draw_label("ETH Balance: ", f"{balances.eth_bal:.4f}", GREEN, 50, 150)
+        signal = analysis['signal'] if analysis else 'N/A'  # No signal until enough price history is collected.
+        self.draw_label("Signal: ", signal, SIGNAL_COLOR.get(signal, YELLOW), 50, 200)
+        self.draw_label("Total Profit/Loss: ", f"{total_profit_loss:.2f}", WHITE, 50, 250)
+        self.draw_graph(eth_prices, max_price, min_price)
+        self.pygame.display.flip()
+
+    def handle_events(self) -> bool:
+        """
+        Processes pending window events and quits pygame if the window was closed.
+
+        Returns:
+            bool: True if the window was closed, False otherwise.
+        """
+        for event in self.pygame.event.get():
+            if event.type == self.pygame.QUIT:
+                self.pygame.quit()
+                return True
+        return False
+
+class PriceHistory:
+    """
+    A fixed-size ring buffer holding the recent price history of one product.
+
+    Prices and timestamps are stored in two parallel NumPy arrays, so appending
+    a sample never allocates and the prices can be sliced directly. Running sums
+    are kept for the requested window lengths so their means cost O(1).
+    """
+    def __init__(self, capacity: int, windows: Tuple[int, ...] = ()) -> None:
+        """
+        Allocates the price and timestamp buffers.
+
+        Args:
+            capacity (int): The maximum number of samples to keep.
+            windows (Tuple[int, ...]): Window lengths to keep running sums for.
+        """
+        if any(n > capacity for n in windows):
+            raise ValueError("Window length exceeds the history capacity.")
+
+        self.capacity = capacity
+        self.prices = np.empty(capacity, dtype=np.float64)
+        self.timestamps = np.empty(capacity, dtype=np.int64)  # Nanoseconds since the epoch.
+        self._head = 0  # Index of the next slot to write.
+        self._count = 0  # Number of valid samples in the buffer.
+        self._sums = dict.fromkeys(windows, 0.0)  # Sum of the last n prices, per window length n.
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: int, price: float) -> None:
+        """
+        Adds a new sample, overwriting the oldest one once the buffer is full.
+
+        Args:
+            timestamp (int): The time the price was observed, in nanoseconds since the epoch.
+            price (float): The observed price.
+        """
+        # Update the running sums before the oldest sample gets overwritten.
+        for n in self._sums:
+            if self._count >= n:
+                self._sums[n] -= self.prices[(self._head - n) % self.capacity]
+            self._sums[n] += price
+
+        self.prices[self._head] = price
+        self.timestamps[self._head] = timestamp
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+        # Recompute the sums once per lap so rounding errors cannot accumulate.
+        if self._head == 0:
+            for n in self._sums:
+                self._sums[n] = float(self.window(n).sum())
+
+    def window(self, n: int) -> np.ndarray:
+        """
+        Returns the last n prices, oldest first.
+
+        Args:
+            n (int): The number of prices to return.
+
+        Returns:
+            np.ndarray: A view into the buffer, or a copy if the window wraps around its end.
+        """
+        n = min(n, self._count)
+        start = self._head - n
+        if start >= 0:
+            return self.prices[start:self._head]
+        return np.concatenate((self.prices[start:], self.prices[:self._head]))
+
+    def samples(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns copies of all stored samples, oldest first.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The timestamps and the prices.
+        """
+        order = np.arange(self._head - self._count, self._head) % self.capacity
+        return self.timestamps[order], self.prices[order]
+
+    def mean(self, n: int) -> float:
+        """
+        Returns the mean of the last n prices from the running sum.
+
+        Args:
+            n (int): One of the window lengths given at construction.
+
+        Returns:
+            float: The mean, or the mean of all samples if fewer than n are available.
+        """
+        return self._sums[n] / min(n, self._count)
+
+    def last(self) -> float:
+        """
+        Returns the most recent price.
+        """
+        return float(self.prices[self._head - 1])
+
+class CoinbaseClient(cbpro.AuthenticatedClient):
+    """
+    An authenticated Coinbase Pro client that parses responses with orjson instead of the json module.
+    """
+    def _send_message(self, method: str, endpoint: str, params: Optional[Dict[str, Any]] = None, data: Optional[str] = None) -> Any:
+        """
+        Sends an API request and returns the decoded JSON response.
+
+        Args:
+            method (str): The HTTP method, e.g. 'get'.
+            endpoint (str): The API endpoint, e.g. '/accounts/'.
+            params (Optional[Dict[str, Any]]): The query parameters.
+            data (Optional[str]): The JSON-encoded request body.
+
+        Returns:
+            Any: The decoded response.
+        """
+        response = self.session.request(method, self.url + endpoint, params=params, data=data,
+                                        auth=self.auth, timeout=30)
+        return orjson.loads(response.content)
+
+class TickerFeed(cbpro.WebsocketClient):
+    """
+    Keeps the latest price of each product from the Coinbase Pro websocket ticker channel.
+    """
+    def __init__(self, products: List[str]) -> None:
+        """
+        Sets up the subscription; call start() to open the connection.
+
+        Args:
+            products (List[str]): The product IDs to follow, e.g. 'ETH-EUR'.
+        """
+        super().__init__(products=products, channels=['ticker'], should_print=False)
+        self._last_prices: Dict[str, Tuple[str, float]] = {}  # Product -> (raw price, monotonic time received).
+
+    def _connect(self) -> None:
+        """
+        Opens the connection, reporting a failure through on_error so it is logged and the
+        listen loop is skipped, instead of the exception ending the thread unseen.
+        """
+        try:
+            super()._connect()
+        except Exception as e:
+            self.on_error(e)
+
+    def _listen(self) -> None:
+        """
+        Receives messages until the feed is stopped. Mirrors WebsocketClient._listen from cbpro 1.1.4 (the
+        PyPI release, which has no keepalive thread), but decodes with orjson, since every tick on the feed
+        is parsed while only one price per cycle is read.
+        """
+        while not self.stop:
+            try:
+                msg = orjson.loads(self.ws.recv())
+            except Exception as e:
+                self.on_error(e)
+            else:
+                self.on_message(msg)
+
+    def on_message(self, msg: Dict[str, Any]) -> None:
+        """
+        Stores the price from a ticker message. Runs on the websocket thread.
+        The price is kept as sent and only converted when it is read.
+        """
+        if msg.get('type') == 'ticker':
+            # A single assignment, so readers never see a price without its time.
+            self._last_prices[msg['product_id']] = (msg['price'], time.monotonic())
+
+    def on_error(self, e: Exception, data: Any = None) -> None:
+        """
+        Logs the error; the feed stops and prices go stale, so callers fall back to REST until it is restarted.
+        """
+        logger.error("Websocket feed error: %s", e)
+        # Not cbpro's on_error, which prints the error to stdout.
+        self.error = e
+        self.stop = True
+
+    def restart_if_stopped(self) -> None:
+        """
+        Reconnects the feed if its thread is not running, since cbpro does not reconnect by itself.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            logger.info("Reconnecting websocket feed")
+            self.start()
+
+    def latest_price(self, product_id: str) -> Optional[float]:
+        """
+        Returns the most recent price of a product.
+
+        Args:
+            product_id (str): The product ID, e.g. 'ETH-EUR'.
+
+        Returns:
+            Optional[float]: The price, or None if none was received in the last FEED_MAX_AGE seconds.
+        """
+        entry = self._last_prices.get(product_id)
+        if entry is None or time.monotonic() - entry[1] > FEED_MAX_AGE:
+            return None
+        return float(entry[0])
+
+def print_market_data(current_prices: Dict[str, float], balances: Balances, analysis: Dict[str, Any], total_profit_loss: float, eth_prices: np.ndarray, max_price: float, min_price: float) -> None:
+    """
+    Prints the current market data to the console.
+    Takes the same arguments as PygameWindow.update_display so either can report a cycle.
+    """
+    # There is no signal until enough price history has been collected.
+    signal = analysis['signal'] if analysis else 'N/A'
+
+    # Write the whole table at once instead of one print per line.
+    sys.stdout.write("\n".join((
+        CONSOLE_BORDER,
+        f"|     Current Market Data  - {datetime.now()}      |",
+        CONSOLE_BORDER,
+        f"| ETH-EUR Price: {current_prices[ETH_SYMBOL]:<15.2f} |",
+        f"| EUR Balance: {balances.eur_bal:<17.2f} |",
+        f"| ETH Balance: {balances.eth_bal:<17.4f} |",
+        f"| Signal: {signal:<21} |",
+        f"| Total Profit/Loss: {total_profit_loss:<13.2f} |",
+    )) + "\n")
+
+def _no_window() -> bool:
+    """
+    Stands in for PygameWindow.handle_events when there is no window, which can never be closed.
+    """
+    return False
 
 class CoinbaseTrader:
     """
     A class for interacting with the Coinbase Pro API and executing trades.
     """
-    def __init__(self) -> None:
+    def __init__(self, report: Callable[..., None] = print_market_data) -> None:
         """
 
         Initializes the CoinbaseTrader with API credentials and sets up the price history.
+
+        Args:
+            report (Callable[..., None]): Called at the end of each cycle to display its results.
         """
         if not all([API_KEY, API_SECRET, API_PASSPHRASE]):
             logger.error("Missing Coinbase API credentials. Please check your .env file.")
             raise ValueError("Missing Coinbase API credentials.")
 
-        self.client = cbpro.AuthenticatedClient(API_KEY, API_SECRET, API_PASSPHRASE)
+        self.client = CoinbaseClient(API_KEY, API_SECRET, API_PASSPHRASE)
+        # Reuse keep-alive connections from the client's session so requests skip the TCP/TLS handshake.
+        self.client.session.mount('https://', HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+        self.client.session.headers['Connection'] = 'keep-alive'
         self.price_history = {
-            'ETH-EUR': [],
-            'BTC-EUR': []  # Keeping BTC history although not used in current strategy.
+            ETH_SYMBOL: PriceHistory(MAX_HISTORY, (MOVING_AVG_SHORT, MOVING_AVG_LONG)),
+            BTC_SYMBOL: PriceHistory(MAX_HISTORY)  # Keeping BTC history although not used in current strategy.
         }
         self.total_profit_loss = 0.0  # Initialize total profit/loss.
+        self._report = report
+        self._balances_cache: Optional[Tuple[float, Balances]] = None  # (monotonic time fetched, balances).
+        self.last_sample_ns: Optional[int] = None  # Time of the last restored sample, set by _load_history.
+        # One worker per request issued at the start of each cycle: a price per product and the balances.
+        self._executor = ThreadPoolExecutor(max_workers=len(SYMBOLS) + 1, thread_name_prefix='coinbase')
+        # Prices are pushed by the websocket feed; REST is only used when it has none.
+        self._feed = TickerFeed(list(SYMBOLS))
+        self._feed.start()
+        self._load_history()
         logger.info("Trading bot initialized")
 
-    def get_account_balances(self) -> Dict[str, Dict[str, float]]:
+    def get_account_balances(self) -> Balances:
         """
         Retrieves account balances for EUR, ETH, and BTC from Coinbase Pro.
+        Balances fetched less than BALANCES_TTL seconds ago are reused, unless an order was placed since.
 
         Returns:
-            Dict[str, Dict[str, float]]: A dictionary containing balances for EUR, ETH, and BTC.
+            Balances: The balances for EUR, ETH, and BTC.
+        """
+        if self._balances_cache is not None and time.monotonic() - self._balances_cache[0] < BALANCES_TTL:
+            return self._balances_cache[1]
+        return self._parse_balances(self.client.get_accounts())
+
+    def _parse_balances(self, accounts: List[Dict[str, Any]]) -> Balances:
         """
-        accounts = self.client.get_accounts()
-        balances = {}
+        Extracts the EUR, ETH, and BTC balances from a get_accounts response.
+
+        Args:
+            accounts (List[Dict[str, Any]]): The accounts returned by Coinbase Pro.
+
+        Returns:
+            Balances: The balances for EUR, ETH, and BTC.
+        """
+        fields = {}
 
         for account in accounts:
-            if account['currency'] in ['EUR', 'ETH', 'BTC']:
-                balances[account['currency']] = {
-                    'balance': float(account['balance']),
-                    'available': float(account['available']),  # Available balance for trade.
-                    'id': account['id']  # Keep the account ID for debug.
-                }
-
-        logger.info(f"Current balances: {balances}")
+            if account['currency'] in ('EUR', 'ETH', 'BTC'):
+                prefix = account['currency'].lower()
+                fields[f'{prefix}_bal'] = float(account['balance'])
+                fields[f'{prefix}_avail'] = float(account['available'])  # Available balance for trade.
+
+        balances = Balances(**fields)
+        self._balances_cache = (time.monotonic(), balances)
+        logger.info("Current balances: %s", balances)
         return balances
 
     def get_current_prices(self) -> Dict[str, float]:
@@ -185,28 +521,126 @@ class CoinbaseTrader:
         Returns:
             Dict[str, float]: A dictionary containing the current prices for ETH-EUR and BTC-EUR.
         """
-        eth_ticker = self.client.get_product_ticker(product_id=ETH_SYMBOL)
-        btc_ticker = self.client.get_product_ticker(product_id=BTC_SYMBOL)
+        return self._record_prices(self._collect_prices(self._submit_prices()))
 
-        current_prices = {
-            'ETH-EUR': float(eth_ticker['price']),
-            'BTC-EUR': float(btc_ticker['price'])
-        }
+    def _submit_prices(self) -> List[Future]:
+        """
+        Starts looking up the price of each product in SYMBOLS on the executor.
+        A REST ticker request may be needed for each product, so they are issued concurrently.
 
+        Returns:
+            List[Future]: One pending price per product, in the order of SYMBOLS.
+        """
+        return [self._executor.submit(self._ticker_price, symbol) for symbol in SYMBOLS]
+
+    def _collect_prices(self, futures: List[Future]) -> Dict[str, float]:
+        """
+        Waits for the lookups started by _submit_prices.
+
+        Args:
+            futures (List[Future]): The pending prices, in the order of SYMBOLS.
+
+        Returns:
+            Dict[str, float]: The price of each product in SYMBOLS.
+        """
+        return {symbol: future.result() for symbol, future in zip(SYMBOLS, futures)}
+
+    def _ticker_price(self, product_id: str) -> float:
+        """
+        Returns the latest price from the websocket feed, or requests the ticker if the feed has no fresh price.
+
+        Args:
+            product_id (str): The product ID, e.g. 'ETH-EUR'.
+
+        Returns:
+            float: The current price.
+        """
+        price = self._feed.latest_price(product_id)
+        if price is None:
+            price = float(self.client.get_product_ticker(product_id=product_id)['price'])
+        return price
+
+    def _record_prices(self, current_prices: Dict[str, float]) -> Dict[str, float]:
+        """
+        Adds the current ETH-EUR and BTC-EUR prices to the price history.
+
+        Args:
+            current_prices (Dict[str, float]): The current price of each product in SYMBOLS.
+
+        Returns:
+            Dict[str, float]: The same prices, for chaining.
+        """
         # Update price history.
-        timestamp = datetime.now()
-        self.price_history['ETH-EUR'].append((timestamp, current_prices['ETH-EUR']))
-        self.price_history['BTC-EUR'].append((timestamp, current_prices['BTC-EUR']))
+        timestamp = time.time_ns()
+        for symbol, price in current_prices.items():
+            self.price_history[symbol].append(timestamp, price)
 
-        # Keep only recent price history, delete old data.
-        max_history = max(MOVING_AVG_SHORT, MOVING_AVG_LONG) + 5  # Keep a little more to avoid issues.
-        if len(self.price_history['ETH-EUR']) > max_history:
-            self.price_history['ETH-EUR'] = self.price_history['ETH-EUR'][-max_history:]
-            self.price_history['BTC-EUR'] = self.price_history['BTC-EUR'][-max_history:]
+        self._save_history()
 
-        logger.info(f"Current prices: {current_prices}")
+        logger.info("Current prices: %s", current_prices)
         return current_prices
 
+    def _save_history(self) -> None:
+        """
+        Saves the price history to HISTORY_FILE so a restart does not have to collect it again.
+        The file is written under a temporary name and then replaced, so a crash never leaves it half written.
+        """
+        arrays = {}
+        for symbol, history in self.price_history.items():
+            arrays[f'{symbol}_timestamps'], arrays[f'{symbol}_prices'] = history.samples()
+
+        tmp_path = HISTORY_FILE + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                np.savez(file, **arrays)
+            os.replace(tmp_path, HISTORY_FILE)
+        except OSError as e:
+            logger.error("Error saving price history: %s", e)
+
+    def _load_history(self) -> None:
+        """
+        Restores the price history saved by a previous run, unless it is older than HISTORY_MAX_AGE.
+        """
+        if not os.path.exists(HISTORY_FILE):
+            return
+
+        try:
+            with np.load(HISTORY_FILE) as saved:
+                arrays = {name: saved[name] for name in saved.files}
+        except Exception as e:  # if the file is unreadable or corrupt.
+            logger.error("Error loading price history: %s", e)
+            return
+
+        # A gap in the samples would distort the moving averages, so only resume a recent history.
+        eth_timestamps = arrays.get(f'{ETH_SYMBOL}_timestamps')
+        if eth_timestamps is None or len(eth_timestamps) == 0 or time.time_ns() - eth_timestamps[-1] > HISTORY_MAX_AGE * 1_000_000_000:
+            logger.info("Saved price history is too old, starting a new one")
+            return
+
+        for symbol, history in self.price_history.items():
+            timestamps = arrays.get(f'{symbol}_timestamps', ())
+            prices = arrays.get(f'{symbol}_prices', ())
+            for timestamp, price in zip(timestamps, prices):
+                history.append(timestamp, price)
+        self.last_sample_ns = int(eth_timestamps[-1])
+
+        logger.info("Restored %d prices from %s", len(self.price_history[ETH_SYMBOL]), HISTORY_FILE)
+
+    def _fetch_market_data(self) -> Tuple[Dict[str, float], Balances]:
+        """
+        Gets the ETH-EUR and BTC-EUR prices and the account balances concurrently.
+        The requests are independent, so a cycle waits for the slowest one instead of all of them in turn.
+
+        Returns:
+            Tuple[Dict[str, float], Balances]: The price of each product in SYMBOLS, and the balances.
+        """
+        # Keep the feed as the price source; this cycle falls back to REST while it reconnects.
+        self._feed.restart_if_stopped()
+
+        price_futures = self._submit_prices()
+        balances_future = self._executor.submit(self.get_account_balances)
+        return self._collect_prices(price_futures), balances_future.result()
+
     def analyze_market(self) -> Optional[Dict[str, float]]:
         """
         Analyzes the market using a moving averages crossover strategy for ETH-EUR.
@@ -216,36 +650,29 @@ class CoinbaseTrader:
                                         (signal, short MA, long MA, current price),
                                         or None if not enough data is available.
         """
-        if len(self.price_history['ETH-EUR']) < MOVING_AVG_LONG:
+        eth_history = self.price_history[ETH_SYMBOL]
+        if len(eth_history) < MOVING_AVG_LONG:
             logger.info("Not enough price history for analysis")
             return None
 
-        # Extract ETH prices.
-        eth_prices = [price for _, price in self.price_history['ETH-EUR']]
-
-        # Calculate moving averages.
-        short_ma = sum(eth_prices[-MOVING_AVG_SHORT:]) / MOVING_AVG_SHORT
-        long_ma = sum(eth_prices[-MOVING_AVG_LONG:]) / MOVING_AVG_LONG
+        # Calculate moving averages from the running sums.
+        short_ma = eth_history.mean(MOVING_AVG_SHORT)
+        long_ma = eth_history.mean(MOVING_AVG_LONG)
 
-        # Simple moving average cross over strategy.
-        if short_ma > long_ma:
-            signal = 'BUY'
-        elif short_ma < long_ma:
-            signal = 'SELL'
-        else:
-            signal = 'HOLD'
+        # Simple moving average cross over strategy: BUY above, SELL below, HOLD when equal.
+        signal = SIGNALS[int(np.sign(short_ma - long_ma)) + 1]
 
-        logger.info(f"Market analysis: {signal} (Short MA: {short_ma:.2f}, Long MA: {long_ma:.2f})")
+        logger.info("Market analysis: %s (Short MA: %.2f, Long MA: %.2f)", signal, short_ma, long_ma)
         return {
             'signal': signal,
             'short_ma': short_ma,
             'long_ma': long_ma,
-            'current_price': eth_prices[-1]
+            'current_price': eth_history.last()
         }
 
     def execute_trade(self, signal: str) -> Optional[Dict]:
         """
-        Executes a trade based on the given signal and available balances.
+        Executes a trade based on the given signal and the current account balances.
 
         Args:
             signal (str): The trading signal ('BUY', 'SELL', or 'HOLD').
@@ -253,12 +680,23 @@ class CoinbaseTrader:
         Returns:
             Optional[Dict]: The order details if a trade was executed, None otherwise.
         """
-        balances = self.get_account_balances()
+        return self._execute_trade(signal, self.get_account_balances())
+
+    def _execute_trade(self, signal: str, balances: Balances) -> Optional[Dict]:
+        """
+        Executes a trade based on the given signal and available balances.
+
+        Args:
+            signal (str): The trading signal ('BUY', 'SELL', or 'HOLD').
+            balances (Balances): The balances fetched for this cycle.
 
-        if signal == 'BUY' and balances.get('EUR', {}).get('available', 0) > MIN_EUR_TRADE:
+        Returns:
+            Optional[Dict]: The order details if a trade was executed, None otherwise.
+        """
+        if signal == 'BUY' and balances.eur_avail > MIN_EUR_TRADE:
             # Buy ETH with a percentage of available EUR.
-            eur_to_use = balances['EUR']['available'] * TRADE_PERCENTAGE
-            logger.info(f"Placing buy order for ETH using {eur_to_use} EUR")
+            eur_to_use = balances.eur_avail * TRADE_PERCENTAGE
+            logger.info("Placing buy order for ETH using %s EUR", eur_to_use)
 
             try:  # Try to make the trade.
                 order = self.client.place_market_order(
@@ -266,19 +704,21 @@ class CoinbaseTrader:
                     side='buy',
                     funds=str(eur_to_use)
                 )
-                logger.info(f"Buy order placed: {order}")
+                if 'id' not in order:  # A rejected order comes back as {'message': ...}.
+                    logger.error("Buy order rejected: %s", order.get('message', order))
+                    return None
+                self._balances_cache = None  # The order changes the balances.
+                logger.info("Buy order placed: %s", order)
+                # Calculate profit/loss from the filled value, or the requested funds if it has not filled yet.
+                self.total_profit_loss -= float(order.get('executed_value', 0)) or eur_to_use  # Subtract the money spent.
                 return order
-                current_price = self.get_current_prices()['ETH-EUR']
-                # Calculate profit/loss.
-                eth_bought = eur_to_use / current_price
-                self.total_profit_loss -= eur_to_use  # Subtract the money spent.
             except Exception as e:  # if any error occurs.
-                logger.error(f"Error placing buy order: {e}")
+                logger.error("Error placing buy order: %s", e)
 
-        elif signal == 'SELL' and balances.get('ETH', {}).get('available', 0) > MIN_ETH_TRADE:
+        elif signal == 'SELL' and balances.eth_avail > MIN_ETH_TRADE:
             # Sell a percentage of available ETH.
-            eth_to_sell = balances['ETH']['available'] * TRADE_PERCENTAGE
-            logger.info(f"Placing sell order for {eth_to_sell} ETH")
+            eth_to_sell = balances.eth_avail * TRADE_PERCENTAGE
+            logger.info("Placing sell order for %s ETH", eth_to_sell)
 
             try:  # Try to make the trade.
                 order = self.client.place_market_order(
@@ -286,14 +726,17 @@ class CoinbaseTrader:
                     side='sell',
                     size=str(eth_to_sell)
                 )
-                logger.info(f"Sell order placed: {order}")
-                current_price = self.get_current_prices()['ETH-EUR']
-                # Calculate profit/loss.
-                eur_received = eth_to_sell * current_price
+                if 'id' not in order:  # A rejected order comes back as {'message': ...}.
+                    logger.error("Sell order rejected: %s", order.get('message', order))
+                    return None
+                self._balances_cache = None  # The order changes the balances.
+                logger.info("Sell order placed: %s", order)
+                # Calculate profit/loss from the filled value, or estimate it from this cycle's price.
+                eur_received = float(order.get('executed_value', 0)) or eth_to_sell * self.price_history[ETH_SYMBOL].last()
                 self.total_profit_loss += eur_received
                 return order
             except Exception as e:  # if any error occurs.
-                logger.error(f"Error placing sell order: {e}")
+                logger.error("Error placing sell order: %s", e)
 
         else:
             logger.info("No trade executed: insufficient funds or HOLD signal")
@@ -306,10 +749,26 @@ class CoinbaseTrader:
         Returns:
             bool: True if the bot can trade, False otherwise.
         """
-        balances = self.get_account_balances()
-        eur_available = balances.get('EUR', {}).get('available', 0)
-        eth_available = balances.get('ETH', {}).get('available', 0)
-        return eur_available > MIN_EUR_TRADE or eth_available > MIN_ETH_TRADE
+        return self._can_trade(self.get_account_balances())
+
+    def _can_trade(self, balances: Balances) -> bool:
+        """
+        Checks if the given balances are enough to execute a trade.
+
+        Args:
+            balances (Balances): The balances fetched for this cycle.
+
+        Returns:
+            bool: True if the bot can trade, False otherwise.
+        """
+        return balances.eur_avail > MIN_EUR_TRADE or balances.eth_avail > MIN_ETH_TRADE
+
+    def close(self) -> None:
+        """
+        Stops the websocket feed and the request threads.
+        """
+        self._feed.close()
+        self._executor.shutdown(wait=False)
 
     def run_trading_cycle(self) -> None:
         """
@@ -317,84 +776,101 @@ class CoinbaseTrader:
         and executes a trade if applicable.
         """
         try:
-            # Get current market data.
-            current_prices = self.get_current_prices()
-
-            # Get balances.
-            balances = self.get_account_balances()
-            eur_balance = balances.get('EUR', {}).get('balance', 0)
-            eth_balance = balances.get('ETH', {}).get('balance', 0)
+            # Get current market data and balances.
+            current_prices, balances = self._fetch_market_data()
+            self._record_prices(current_prices)
 
             # Get the last 10 hours
-            eth_prices = [price for _, price in self.price_history['ETH-EUR'][-NUM_PRICE_POINTS:]]
+            eth_prices = self.price_history[ETH_SYMBOL].window(NUM_PRICE_POINTS)
 
             # Calculate the maximum and minimum prices in the last 10 hours.
-            max_price = max(eth_prices) if eth_prices else 0
-            min_price = min(eth_prices) if eth_prices else 0
+            # The window is never empty since this cycle's price was just recorded.
+            max_price = float(eth_prices.max())
+            min_price = float(eth_prices.min())
 
             # Analyze the market.
             analysis = self.analyze_market()
 
             # Execute trade if we have enough data for analysis and the bot can trade.
-            if analysis and self.can_trade():
-                self.execute_trade(analysis['signal'])
+            # The balances fetched above are reused rather than requested again.
+            if analysis and self._can_trade(balances):
+                self._execute_trade(analysis['signal'], balances)
             
-            if platform.system() == 'Windows':
-                # Update the pygame window
-                pygame_window.update_display(
-                    current_prices,
-                    balances,
-                    analysis,
-                    self.total_profit_loss,
-                    eth_prices,
-                    max_price,
-                    min_price
-                )
-            else:
-                # Display market data.
-                print(f"-----------------------------------------")
-                print(f"|     Current Market Data  - {datetime.now()}      |")
-                print(f"-----------------------------------------")
-                print(f"| ETH-EUR Price: {current_prices['ETH-EUR']:<15.2f} |")
-                print(f"| EUR Balance: {eur_balance:<17.2f} |")
-                print(f"| ETH Balance: {eth_balance:<17.4f} |")
-                print(f"| Signal: {analysis['signal']:<21} |")
-                print(f"| Total Profit/Loss: {self.total_profit_loss:<13.2f} |")
+            # Display market data in the pygame window or the console.
+            self._report(
+                current_prices,
+                balances,
+                analysis,
+                self.total_profit_loss,
+                eth_prices,
+                max_price,
+                min_price
+            )
 
         except Exception as e:
-            logger.error(f"Error in trading cycle: {e}")
+            logger.error("Error in trading cycle: %s", e)
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parses the command line arguments.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Trade ETH against EUR on Coinbase Pro using a moving average crossover strategy.")
+    parser.add_argument('--gui', action=argparse.BooleanOptionalAction, default=IS_WINDOWS,
+                        help="show the pygame window instead of printing to the console (default: on for Windows)")
+    return parser.parse_args()
 
 def main() -> None:
     """
     Main function to run the trading bot.
     Handles the bot's trading cycle and error handling.
     """
+    args = parse_args()
+    start_logging()
 
-    # initialize pygame window if it is windows.
-    if platform.system() == 'Windows':
-        global pygame_window
+    # initialize pygame window if requested, otherwise report to the console.
+    if args.gui:
         pygame_window = PygameWindow()
-
-    trader = CoinbaseTrader()
+        trader = CoinbaseTrader(pygame_window.update_display)
+        window_closed = pygame_window.handle_events
+    else:
+        trader = CoinbaseTrader(print_market_data)
+        window_closed = _no_window
     
     
     logger.info("Starting trading bot")
     print("Trading bot started. Press Ctrl+C to stop.")
 
+    stop = threading.Event()  # Set when the window is closed.
+    next_run = time.monotonic()
+    if trader.last_sample_ns is not None:
+        # Continue the restored history's hourly grid, so a restart does not record a sample right after its last one.
+        next_run += max(0.0, CHECK_INTERVAL - (time.time_ns() - trader.last_sample_ns) / 1_000_000_000)
+        logger.info("Resuming the saved price history, first cycle in %.0f seconds", next_run - time.monotonic())
+
     try:  # Try to keep the bot working.
-        while True:
-            trader.run_trading_cycle()  # Execute one trading cycle.          
-            if platform.system() == 'Windows':
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-            time.sleep(CHECK_INTERVAL)  # wait
+        stop.wait(next_run - time.monotonic())  # Only waits when resuming a saved history.
+        while not stop.is_set():
+            trader.run_trading_cycle()  # Execute one trading cycle.
+            if window_closed():
+                stop.set()
+
+            # Schedule from the previous start rather than the end of the cycle, so its runtime does not add up.
+            next_run += CHECK_INTERVAL
+            now = time.monotonic()
+            if next_run < now:  # The cycle overran; skip the missed runs instead of catching up.
+                next_run += ((now - next_run) // CHECK_INTERVAL + 1) * CHECK_INTERVAL
+            stop.wait(next_run - now)  # wait
     except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+        logger.error("An unexpected error occurred: %s", e)
         logger.info("The bot will continue working.")
     except KeyboardInterrupt:
         logger.info("Trading bot stopped by user")
         print("Trading bot stopped.")
+    finally:
+        trader.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file